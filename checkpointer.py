@@ -0,0 +1,376 @@
+import random
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+DEFAULT_DB_PATH = "chatbot_sessions.db"
+# Checkpoints kept per session; older ones are pruned together with their blobs
+DEFAULT_KEEP_CHECKPOINTS = 20
+# Payloads larger than this are zlib-compressed before being stored
+COMPRESS_THRESHOLD = 512
+# Blob type of a row that points at an identical value stored under an earlier version
+REF_TYPE = "ref"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    node TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+def session_config(session_id: str) -> Dict:
+    """Graph config that resumes the conversation stored under session_id"""
+    return {"configurable": {"thread_id": session_id}}
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """Checkpointer that persists conversation state in a local SQLite file.
+
+    Snapshots are delta-encoded: each checkpoint row only stores channel
+    versions, and a channel value is written to the blobs table only when its
+    serialized bytes differ from the parent checkpoint's. Nodes that return the
+    whole state bump every channel's version, so an unchanged value gets a
+    small reference row to the earlier blob instead of a copy. The database
+    runs in WAL mode so any number of workers can read sessions while one of
+    them writes.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, keep_checkpoints: int = DEFAULT_KEEP_CHECKPOINTS, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.keep_checkpoints = keep_checkpoints
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        with self._write_lock:
+            self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread so readers never block on each other
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) > COMPRESS_THRESHOLD:
+            return f"{type_}+zlib", zlib.compress(data)
+        return type_, data
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        if type_.endswith("+zlib"):
+            type_, data = type_[:-len("+zlib")], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    def get_next_version(self, current: Optional[Any], channel: None = None) -> str:
+        # Same scheme as langgraph's own savers: the random suffix keeps versions unique when
+        # two runs on one session start from the same checkpoint (a fork, or two workers),
+        # so their blobs never share a key and INSERT OR IGNORE cannot drop one of them
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def put(self, config: Dict, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> Dict:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        parent_id = configurable.get("checkpoint_id")
+
+        snapshot = checkpoint.copy()
+        values = snapshot.pop("channel_values", {})
+        dumped = {
+            channel: self._dump(values[channel]) if channel in values else ("empty", None)
+            for channel in new_versions
+        }
+
+        type_, data = self._dump(snapshot)
+        metadata_type, metadata_data = self._dump(metadata)
+
+        with self._transaction() as conn:
+            parent = self._load_snapshot(conn, thread_id, checkpoint_ns, parent_id) or {}
+            node = self._changed_nodes(parent, checkpoint) or metadata.get("source")
+            parent_versions = parent.get("channel_versions", {})
+            blobs = []
+            for channel, version in new_versions.items():
+                blob = dumped[channel]
+                if channel in parent_versions:
+                    stored_version, stored = self._stored_blob(conn, thread_id, checkpoint_ns, channel,
+                                                               str(parent_versions[channel]))
+                    if stored == blob:
+                        blob = (REF_TYPE, stored_version.encode())
+                blobs.append((thread_id, checkpoint_ns, channel, str(version), *blob))
+            conn.executemany("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_id, node,
+                 type_, data, metadata_type, metadata_data),
+            )
+            self._prune(conn, thread_id, checkpoint_ns)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _load_snapshot(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str,
+                       checkpoint_id: Optional[str]) -> Optional[Dict]:
+        """A stored checkpoint without its channel values"""
+        if not checkpoint_id:
+            return None
+        row = conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchone()
+        return self._load(*row) if row else None
+
+    def _stored_blob(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, channel: str,
+                     version: str) -> Tuple[str, Optional[Tuple]]:
+        """The (type, blob) row holding a channel version's value, following a reference row"""
+        query = (
+            "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND channel = ? AND version = ?"
+        )
+        row = conn.execute(query, (thread_id, checkpoint_ns, channel, version)).fetchone()
+        if row and row[0] == REF_TYPE:
+            # References always point at a value row, never at another reference
+            version = row[1].decode()
+            row = conn.execute(query, (thread_id, checkpoint_ns, channel, version)).fetchone()
+        return version, row
+
+    def _changed_nodes(self, parent: Dict, checkpoint: Checkpoint) -> str:
+        """Names of the nodes that ran between the parent checkpoint and this one"""
+        seen = checkpoint.get("versions_seen", {})
+        parent_seen = parent.get("versions_seen", {})
+        return ",".join(
+            sorted(n for n, v in seen.items() if not n.startswith("__") and parent_seen.get(n) != v)
+        )
+
+    def put_writes(self, config: Dict, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        configurable = config["configurable"]
+        rows = []
+        for i, (channel, value) in enumerate(writes):
+            type_, data = self._dump(value)
+            rows.append((
+                configurable["thread_id"],
+                configurable.get("checkpoint_ns", ""),
+                configurable["checkpoint_id"],
+                task_id,
+                WRITES_IDX_MAP.get(channel, i),
+                channel,
+                type_,
+                data,
+            ))
+        # All of a task's writes go in one transaction, committed before returning,
+        # so they survive a crash and other workers can see them straight away
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _prune(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str):
+        stale = conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_checkpoints),
+        ).fetchall()
+        if not stale:
+            return
+        conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            [(thread_id, checkpoint_ns, row[0]) for row in stale],
+        )
+        conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            [(thread_id, checkpoint_ns, row[0]) for row in stale],
+        )
+        # Blobs are shared between checkpoints, so only drop versions no survivor uses
+        live = set()
+        for type_, data in conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ):
+            for channel, version in self._load(type_, data)["channel_versions"].items():
+                live.add((channel, str(version)))
+        # Keep the values that live reference rows point at
+        for channel, version, target in conn.execute(
+            "SELECT channel, version, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND type = ?",
+            (thread_id, checkpoint_ns, REF_TYPE),
+        ).fetchall():
+            if (channel, version) in live:
+                live.add((channel, target.decode()))
+        dead = [
+            (thread_id, checkpoint_ns, channel, version)
+            for channel, version in conn.execute(
+                "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            )
+            if (channel, version) not in live
+        ]
+        conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            dead,
+        )
+
+    def _to_tuple(self, conn: sqlite3.Connection, row: Tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, metadata_type, metadata_data = row
+        checkpoint = self._load(type_, data)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            _, blob = self._stored_blob(conn, thread_id, checkpoint_ns, channel, str(version))
+            if blob and blob[0] != "empty":
+                channel_values[channel] = self._load(*blob)
+        checkpoint["channel_values"] = channel_values
+
+        pending_writes = [
+            (task_id, channel, self._load(w_type, w_data))
+            for task_id, channel, w_type, w_data in conn.execute(
+                "SELECT task_id, channel, type, blob FROM writes WHERE thread_id = ? "
+                "AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        ]
+
+        parent_config = None
+        if parent_id:
+            parent_config = {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_id,
+                }
+            }
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=checkpoint,
+            metadata=self._load(metadata_type, metadata_data),
+            parent_config=parent_config,
+            pending_writes=pending_writes,
+        )
+
+    def get_tuple(self, config: Dict) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params = [configurable["thread_id"], configurable.get("checkpoint_ns", "")]
+        if configurable.get("checkpoint_id"):
+            query += " AND checkpoint_id = ?"
+            params.append(configurable["checkpoint_id"])
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+
+        conn = self._connect()
+        row = conn.execute(query, params).fetchone()
+        return self._to_tuple(conn, row) if row else None
+
+    def list(self, config: Optional[Dict], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[Dict] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config:
+            configurable = config["configurable"]
+            clauses.append("thread_id = ?")
+            params.append(configurable["thread_id"])
+            if "checkpoint_ns" in configurable:
+                clauses.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if configurable.get("checkpoint_id"):
+                clauses.append("checkpoint_id = ?")
+                params.append(configurable["checkpoint_id"])
+        if before:
+            clauses.append("checkpoint_id < ?")
+            params.append(before["configurable"]["checkpoint_id"])
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        conn = self._connect()
+        count = 0
+        for row in conn.execute(query, params).fetchall():
+            item = self._to_tuple(conn, row)
+            if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            yield item
+            count += 1
+            if limit is not None and count >= limit:
+                break
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._transaction() as conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
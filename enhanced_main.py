@@ -1,8 +1,10 @@
 import os
+from functools import partial
 from typing import TypedDict, Annotated, List, Dict
 from langgraph.graph import StateGraph, START, END, add_messages
-from logic import classify_input, search_web_information, generate_search_response, handle_chat, route_conversation
+from logic import classify_input, search_web_information, generate_search_response, handle_chat, route_conversation, discard_search_prefetch
 from financial_advisor import analyze_business_goal, FinancialAdvisor
+from checkpointer import SqliteCheckpointer, session_config
 
 class ConversationState(TypedDict):
     messages: Annotated[list, add_messages]
@@ -14,24 +16,29 @@ class ConversationState(TypedDict):
     search_results: List[Dict]
     search_queries: List[str]
     sources: List[str]
+    deadline: float  # epoch seconds, set by classify_input at the start of every turn
+    request_budget: float  # optional seconds allowed per turn; defaults to upstream.DEFAULT_REQUEST_BUDGET
     # Financial advisor specific fields
     is_financial_query: bool
     financial_plan: Dict
     business_goal: str
     timeline: int
     financial_data: Dict
+    output_format: str  # optional format for financial plans: text, markdown, html or json
+
+FINANCIAL_KEYWORDS = [
+    'expand', 'hire', 'equipment', 'invest', 'budget', 'capital', 'funding',
+    'loan', 'savings', 'cash flow', 'business plan', 'growth', 'scale',
+    'new location', 'staff', 'inventory', 'financial plan'
+]
+
+def is_financial_input(user_input):
+    user_input = user_input.lower()
+    return any(keyword in user_input for keyword in FINANCIAL_KEYWORDS)
 
 def detect_financial_query(state):
     """Detect if the user input is related to financial planning or business goals"""
-    user_input = state["user_input"].lower()
-    
-    financial_keywords = [
-        'expand', 'hire', 'equipment', 'invest', 'budget', 'capital', 'funding',
-        'loan', 'savings', 'cash flow', 'business plan', 'growth', 'scale',
-        'new location', 'staff', 'inventory', 'financial plan'
-    ]
-    
-    is_financial = any(keyword in user_input for keyword in financial_keywords)
+    is_financial = is_financial_input(state["user_input"])
     
     return {
         **state,
@@ -41,6 +48,11 @@ def detect_financial_query(state):
 def extract_financial_parameters(state):
     """Extract financial planning parameters from user input"""
     user_input = state["user_input"]
+    # Use the format the client asked for, or the one this session used last
+    output_format = state.get("output_format") or state.get("financial_data", {}).get("output_format") or "text"
+
+    # Financial queries never use the search results, so drop any speculative search
+    discard_search_prefetch(state)
     
     # This is a simplified extraction - in production, you'd use NLP
     # to extract structured data from natural language
@@ -53,7 +65,8 @@ def extract_financial_parameters(state):
         "monthly_inflow": 50000,  # Would be extracted or requested
         "monthly_outflow": 40000,  # Would be extracted or requested
         "current_savings": 10000,  # Would be extracted or requested
-        "preferred_funding": "self-funded"
+        "preferred_funding": "self-funded",
+        "output_format": output_format
     }
     
     return {
@@ -72,7 +85,8 @@ def generate_financial_plan(state):
             monthly_inflow=financial_data.get("monthly_inflow", 50000),
             monthly_outflow=financial_data.get("monthly_outflow", 40000),
             current_savings=financial_data.get("current_savings", 10000),
-            preferred_funding=financial_data.get("preferred_funding", "self-funded")
+            preferred_funding=financial_data.get("preferred_funding", "self-funded"),
+            output_format=financial_data.get("output_format", "text")
         )
         
         return {
@@ -103,12 +117,17 @@ def route_enhanced_conversation(state):
     else:
         return "handle_chat"
 
-def create_enhanced_workflow():
-    """Create enhanced workflow with financial planning capabilities"""
+def create_enhanced_workflow(checkpointer=None):
+    """Create enhanced workflow with financial planning capabilities.
+
+    Pass a checkpointer (e.g. SqliteCheckpointer) and invoke with
+    session_config(session_id) to persist conversations between turns.
+    """
     workflow = StateGraph(ConversationState)
     
     # Add all nodes
-    workflow.add_node("classify_input", classify_input)
+    # Financial routing wins over search, so a search prefetch for those inputs would be wasted
+    workflow.add_node("classify_input", partial(classify_input, skip_prefetch=is_financial_input))
     workflow.add_node("detect_financial_query", detect_financial_query)
     workflow.add_node("extract_financial_parameters", extract_financial_parameters)
     workflow.add_node("generate_financial_plan", generate_financial_plan)
@@ -138,11 +157,11 @@ def create_enhanced_workflow():
     # Chat flow
     workflow.add_edge("handle_chat", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 if __name__ == "__main__":
     # Test the enhanced workflow with financial planning
-    wf = create_enhanced_workflow()
+    wf = create_enhanced_workflow(checkpointer=SqliteCheckpointer())
 
     # Test financial planning query
     financial_test_state = {
@@ -155,6 +174,7 @@ if __name__ == "__main__":
         "search_results": [],
         "search_queries": [],
         "sources": [],
+        "deadline": 0.0,
         "is_financial_query": False,
         "financial_plan": {},
         "business_goal": "",
@@ -164,7 +184,7 @@ if __name__ == "__main__":
 
     print("🏢 FINANCIAL PLANNING TEST")
     print("=" * 50)
-    result = wf.invoke(financial_test_state)
+    result = wf.invoke(financial_test_state, session_config(financial_test_state["session_id"]))
     
     for msg in result["messages"]:
         if isinstance(msg, dict):
@@ -187,6 +207,7 @@ if __name__ == "__main__":
         "search_results": [],
         "search_queries": [],
         "sources": [],
+        "deadline": 0.0,
         "is_financial_query": False,
         "financial_plan": {},
         "business_goal": "",
@@ -196,7 +217,7 @@ if __name__ == "__main__":
     
     print("\n🔍 SEARCH TEST")
     print("=" * 50)
-    search_result = wf.invoke(search_test_state)
+    search_result = wf.invoke(search_test_state, session_config(search_test_state["session_id"]))
     
     for msg in search_result["messages"]:
         if isinstance(msg, dict):
@@ -4,6 +4,8 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 import calendar
 
+from plan_renderer import render_plan
+
 @dataclass
 class BusinessGoal:
     description: str
@@ -299,69 +301,15 @@ class FinancialAdvisor:
         
         return alternatives
 
-    def format_plan_output(self, plan: Dict) -> str:
-        """Format the plan into a user-friendly output"""
-        output = []
-        
-        # Header
-        output.append("🎯 SMART FINANCIAL PLAN FOR YOUR BUSINESS GOAL")
-        output.append("=" * 50)
-        
-        # Goal Analysis
-        goal_info = plan['goal_analysis']
-        output.append(f"\n📋 GOAL: {goal_info['description']}")
-        output.append(f"⏰ Timeline: {goal_info['timeline_months']} months")
-        output.append(f"💰 Estimated Budget: ${goal_info['estimated_budget']:,.2f}")
-        output.append(f"🏦 Current Savings: ${goal_info['current_savings']:,.2f}")
-        output.append(f"📊 Additional Needed: ${goal_info['additional_needed']:,.2f}")
-        
-        # Financial Capacity
-        capacity = plan['financial_capacity']
-        output.append(f"\n💵 FINANCIAL CAPACITY")
-        output.append(f"Monthly Net Cash Flow: ${capacity['monthly_net_flow']:,.2f}")
-        output.append(f"Monthly Savings Target: ${capacity['monthly_savings_target']:,.2f}")
-        output.append(f"Time to Save: {capacity['months_needed_to_save']} months")
-        
-        # Feasibility
-        feasibility = plan['feasibility']
-        status = "✅ ACHIEVABLE" if feasibility['is_achievable'] else "⚠️ CHALLENGING"
-        output.append(f"\n{status}")
-        output.append(f"Confidence Level: {feasibility['confidence_level']}")
-        
-        # Risks
-        if feasibility['risk_assessment']:
-            output.append(f"\n⚠️ RISK ASSESSMENT:")
-            for risk in feasibility['risk_assessment']:
-                output.append(f"  • {risk}")
-        
-        # Monthly Plan
-        output.append(f"\n📅 MONTHLY SAVINGS PLAN")
-        output.append("-" * 30)
-        for monthly_plan in plan['monthly_plan'][:6]:  # Show first 6 months
-            output.append(f"Month {monthly_plan.month}: {monthly_plan.milestone}")
-            output.append(f"  💰 Save: ${monthly_plan.target_savings:,.2f}")
-            output.append(f"  📈 Total: ${monthly_plan.cumulative_savings:,.2f}")
-            output.append(f"  🎯 Actions: {', '.join(monthly_plan.actions[:2])}")
-            output.append("")
-        
-        # Recommendations
-        output.append("💡 RECOMMENDATIONS:")
-        for rec in plan['recommendations']:
-            output.append(f"  {rec}")
-        
-        # Alternatives (if any)
-        if plan['alternatives']:
-            output.append(f"\n🔄 ALTERNATIVE OPTIONS:")
-            for alt in plan['alternatives']:
-                output.append(f"  {alt['option']}: {alt['description']}")
-                output.append(f"    Budget Reduction: {alt['budget_reduction']}")
-        
-        return "\n".join(output)
+    def format_plan_output(self, plan: Dict, fmt: str = "text") -> str:
+        """Format the plan into a user-friendly output (text, markdown, html or json)"""
+        return render_plan(plan, fmt)
 
 # Example usage function
 def analyze_business_goal(goal_description: str, timeline_months: int, 
                          monthly_inflow: float, monthly_outflow: float,
-                         current_savings: float = 0, preferred_funding: str = 'self-funded'):
+                         current_savings: float = 0, preferred_funding: str = 'self-funded',
+                         output_format: str = 'text'):
     """Main function to analyze business goal and create financial plan"""
     
     advisor = FinancialAdvisor()
@@ -380,7 +328,7 @@ def analyze_business_goal(goal_description: str, timeline_months: int,
     )
     
     plan = advisor.create_financial_plan(goal, financial_info)
-    formatted_output = advisor.format_plan_output(plan)
+    formatted_output = advisor.format_plan_output(plan, output_format)
     
     return formatted_output, plan
 
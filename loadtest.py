@@ -0,0 +1,500 @@
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+from langchain.schema import AIMessage
+
+import logic
+import upstream
+from checkpointer import SqliteCheckpointer, session_config
+from enhanced_main import create_enhanced_workflow, detect_financial_query
+
+ROUTES = ["chat", "search", "financial", "mixed"]
+# New sessions per second
+DEFAULT_RATES = [1, 2, 5, 10, 20, 40]
+DEFAULT_TURNS = 3
+
+
+def lognormal_sampler(median, p99):
+    """Latency sampler with the given median and p99, in seconds"""
+    sigma = math.log(p99 / median) / 2.326
+    mu = math.log(median)
+    return lambda: random.lognormvariate(mu, sigma)
+
+
+def _fake_call(latency, timeout):
+    # Like a real client with a request timeout: give up after timeout seconds
+    if timeout is not None and latency > timeout:
+        time.sleep(timeout)
+        raise TimeoutError(f"request timed out after {timeout:.1f}s")
+    time.sleep(latency)
+
+
+class FakeLLM:
+    """Stands in for the Groq model with a realistic response-time distribution"""
+
+    def __init__(self, median=0.9, p99=4.0, time_scale=1.0):
+        self.sample = lognormal_sampler(median * time_scale, p99 * time_scale)
+
+    def invoke(self, messages, timeout=None):
+        _fake_call(self.sample(), timeout)
+        return AIMessage(content="chat")
+
+
+class FakeSearchRequest:
+    def __init__(self, search, params):
+        self.search = search
+        self.params = params
+        self.timeout = None
+
+    def get_dict(self):
+        _fake_call(self.search.sample(), self.timeout)
+        return {"organic_results": [
+            {"title": f"Result {i} for {self.params['q'][:30]}", "link": f"https://example.com/{i}"}
+            for i in range(5)
+        ]}
+
+
+class FakeSearch:
+    """Stands in for SerpAPI with a realistic response-time distribution"""
+
+    def __init__(self, median=0.7, p99=3.0, time_scale=1.0):
+        self.sample = lognormal_sampler(median * time_scale, p99 * time_scale)
+
+    def get_params(self, query):
+        return {"q": query}
+
+    def search_engine(self, params):
+        return FakeSearchRequest(self, params)
+
+
+def install_fake_upstreams(time_scale=1.0):
+    logic.llm = FakeLLM(time_scale=time_scale)
+    logic.search_tool = FakeSearch(time_scale=time_scale)
+
+
+def load_corpus(path):
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                entries.append(entry.get("body") or entry.get("title", ""))
+    return entries
+
+
+def predict_route(user_input):
+    if detect_financial_query({"user_input": user_input})["is_financial_query"]:
+        return "financial"
+    return "search" if logic.needs_web_search(user_input) else "chat"
+
+
+def arrival_times(pattern, rate, duration, burst_factor=5.0, burst_period=10.0, burst_length=1.0):
+    """Open-loop arrival schedule in seconds from the start of the step"""
+    if pattern == "poisson":
+        peak, intensity = rate, lambda t: 1.0
+    elif pattern == "ramp":
+        peak, intensity = rate, lambda t: t / duration
+    elif pattern == "burst":
+        peak = rate * burst_factor
+        intensity = lambda t: 1.0 if t % burst_period < burst_length else 1.0 / burst_factor
+    else:
+        raise ValueError(f"Unknown arrival pattern: {pattern}")
+
+    # Thinning: draw at the peak rate and keep each arrival with probability intensity(t)
+    times, t = [], 0.0
+    while True:
+        t += random.expovariate(peak)
+        if t >= duration:
+            return times
+        if random.random() < intensity(t):
+            times.append(t)
+
+
+def new_state(user_input, session_id):
+    return {
+        "messages": [],
+        "user_input": user_input,
+        "conversation_type": "",
+        "context": {},
+        "session_id": session_id,
+        "needs_web_search": False,
+        "search_results": [],
+        "search_queries": [],
+        "sources": [],
+        "deadline": 0.0,
+        "is_financial_query": False,
+        "financial_plan": {},
+        "business_goal": "",
+        "timeline": 0,
+        "financial_data": {}
+    }
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and only ever grows
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def upstream_queue_summary(stats):
+    """Wait percentiles for call_upstream attempts, plus calls turned away for lack of a slot"""
+    calls = [name for name in stats if " " not in name]
+    waits = [w for name in calls for w in stats[name]["waits"]]
+    prefetch = [stats[name] for name in stats if name.endswith(" prefetch")]
+    return {
+        "upstream_wait_p50": percentile(waits, 50) if waits else 0.0,
+        "upstream_wait_p99": percentile(waits, 99) if waits else 0.0,
+        "upstream_busy": sum(stats[name]["rejected"] for name in calls),
+        "prefetch_wait_p99": percentile([w for p in prefetch for w in p["waits"]], 99)
+        if any(p["waits"] for p in prefetch) else 0.0,
+        "prefetch_rejected": sum(p["rejected"] for p in prefetch),
+    }
+
+
+class TimedCheckpointer(SqliteCheckpointer):
+    """SqliteCheckpointer that records how long each checkpoint and task-write commit takes"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._timings_lock = threading.Lock()
+        self.timings = []
+
+    def _timed(self, method, *args, **kwargs):
+        started = time.time()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            with self._timings_lock:
+                self.timings.append(time.time() - started)
+
+    def put(self, *args, **kwargs):
+        return self._timed(super().put, *args, **kwargs)
+
+    def put_writes(self, *args, **kwargs):
+        return self._timed(super().put_writes, *args, **kwargs)
+
+    def take_timings(self):
+        with self._timings_lock:
+            timings, self.timings = self.timings, []
+        return timings
+
+
+def turn_state(user_input, session_id, turn):
+    # Later turns only send the new input; the checkpointer restores the rest of the session
+    if turn == 0:
+        return new_state(user_input, session_id)
+    return {"user_input": user_input, "session_id": session_id}
+
+
+def run_step(workflow, checkpointer, inputs, rate, duration, pattern, workers, turns, think_time, drain_timeout):
+    """Start sessions on an open-loop schedule and time every turn.
+
+    Each session runs its turns one after another on one thread, with an
+    exponential think time between them, against a checkpointed workflow.
+    With workers=0 the pool has a thread for every session, so the harness
+    never limits concurrency. "queue" is the wait for a load worker;
+    upstream_* and prefetch_* cover the wait for an upstream slot and thread.
+    """
+    schedule = arrival_times(pattern, rate, duration)
+    records = []
+    session_spans = []
+    lock = threading.Lock()
+    active = [0, 0]  # current, peak
+
+    def run_session(i, scheduled):
+        session_id = f"load-{rate:g}-{i}"
+        opened = time.time()
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        try:
+            for turn in range(turns):
+                delay = scheduled - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                started = time.time()
+                user_input = inputs[(i * turns + turn) % len(inputs)]
+                try:
+                    result = workflow.invoke(turn_state(user_input, session_id, turn), session_config(session_id))
+                    reply = result["messages"][-1].content if result["messages"] else ""
+                    degraded = reply == logic.FALLBACK_REPLY or (
+                        result.get("needs_web_search") and not result.get("is_financial_query")
+                        and not result.get("search_results")
+                    )
+                    error = False
+                except Exception as e:
+                    print(f"Request failed: {e}")
+                    degraded, error = True, True
+                finished = time.time()
+                with lock:
+                    records.append({
+                        "queue": started - scheduled,
+                        "latency": finished - scheduled,
+                        "finished": finished,
+                        "degraded": degraded,
+                        "error": error,
+                    })
+                scheduled = finished + (random.expovariate(1 / think_time) if think_time > 0 else 0)
+        finally:
+            with lock:
+                active[0] -= 1
+                session_spans.append(time.time() - opened)
+
+    gc.collect()
+    upstream.reset_queue_stats()
+    checkpointer.take_timings()
+    rss_before = rss_bytes()
+    cpu_before = time.process_time()
+    executor = ThreadPoolExecutor(max_workers=workers or max(1, len(schedule)), thread_name_prefix="load")
+    futures = []
+    start = time.time()
+    for i, offset in enumerate(schedule):
+        delay = start + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        futures.append(executor.submit(run_session, i, start + offset))
+    wait(futures, timeout=drain_timeout)
+    elapsed = time.time() - start
+    cpu = (time.process_time() - cpu_before) / elapsed
+    executor.shutdown(wait=False, cancel_futures=True)
+    queues_upstream = upstream_queue_summary(upstream.queue_stats())
+    checkpoint_times = checkpointer.take_timings()
+    gc.collect()
+
+    with lock:
+        done = list(records)
+        spans = list(session_spans)
+        peak_sessions = active[1]
+    latencies = [r["latency"] for r in done]
+    queues = [r["queue"] for r in done]
+    finished = sorted(r["finished"] for r in done)
+    # Completion rate over the completion span, so one slow final turn does not dilute it
+    span = finished[-1] - finished[0] if len(finished) > 1 else duration
+    return {
+        "offered_rps": rate,
+        "sessions": len(schedule),
+        "arrival_rps": len(schedule) / duration,
+        "sent": len(schedule) * turns,
+        "completed": len(done),
+        "throughput_rps": (len(done) - 1) / span if len(done) > 1 and span > 0 else len(done) / duration,
+        # Little's law over the time sessions were being started
+        "mean_sessions": sum(spans) / elapsed if elapsed > 0 else 0.0,
+        "peak_sessions": peak_sessions,
+        "queue_p50": percentile(queues, 50),
+        "queue_p99": percentile(queues, 99),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "p999": percentile(latencies, 99.9),
+        "checkpoint_p99": percentile(checkpoint_times, 99) if checkpoint_times else 0.0,
+        "cpu": cpu,
+        "degraded": sum(r["degraded"] for r in done),
+        "errors": sum(r["error"] for r in done),
+        "rss_growth_mb": (rss_bytes() - rss_before) / 2 ** 20,
+        **queues_upstream,
+    }
+
+
+def is_sustained(step, slo, max_queue=1.0):
+    return step["completed"] == step["sent"] and step["queue_p99"] <= max_queue and step["p99"] <= slo
+
+
+def limiting_resource(step, slo, max_queue=1.0):
+    """Name the resource that kept a step from being sustained.
+
+    A saturated CPU slows every thread and inflates every queue, so it is
+    checked first. Otherwise the inner resource with the longest p99 wait
+    wins: when upstream slots or checkpoint commits back up, turns take
+    longer and the queues outside them grow as a consequence.
+    """
+    if is_sustained(step, slo, max_queue):
+        return "none"
+    if step["cpu"] >= 0.9:
+        return "CPU (one core, GIL)"
+    waits = {
+        "upstream slots (--upstream-in-flight)": step["upstream_wait_p99"] if not step["upstream_busy"] else math.inf,
+        "checkpoint writes (SQLite write lock)": step["checkpoint_p99"],
+    }
+    resource, longest = max(waits.items(), key=lambda item: item[1])
+    if longest > max_queue:
+        return resource
+    if step["queue_p99"] > max_queue:
+        return "load workers (--workers)"
+    if step["p99"] > slo:
+        return "upstream response time"
+    return "turns still running at the drain timeout"
+
+
+def run_sweep(corpus, rates, duration, pattern, workers, slo, routes, turns, think_time, db_path,
+              stop_on_collapse=True):
+    checkpointer = TimedCheckpointer(db_path)
+    workflow = create_enhanced_workflow(checkpointer=checkpointer)
+    by_route = {route: [] for route in ROUTES}
+    for user_input in corpus:
+        by_route[predict_route(user_input)].append(user_input)
+        by_route["mixed"].append(user_input)
+
+    report = {}
+    for route in routes:
+        inputs = by_route[route]
+        if not inputs:
+            print(f"Skipping {route}: no matching requests in corpus")
+            continue
+        # Warm up imports, graph compilation and thread pools outside the measurements
+        workflow.invoke(new_state(inputs[0], f"warmup-{route}"), session_config(f"warmup-{route}"))
+        steps = []
+        for rate in rates:
+            step = run_step(workflow, checkpointer, inputs, rate, duration, pattern, workers, turns, think_time,
+                            drain_timeout=duration + turns * (4 * slo + 5 * think_time))
+            step["limited_by"] = limiting_resource(step, slo)
+            steps.append(step)
+            print(f"{route:>9} {rate:>6g} sessions/s -> {step['throughput_rps']:.1f} turns/s, "
+                  f"{step['mean_sessions']:.0f} concurrent sessions (peak {step['peak_sessions']}), "
+                  f"p99 {step['p99']:.2f}s, upstream queue p99 {step['upstream_wait_p99']:.2f}s, "
+                  f"checkpoint p99 {step['checkpoint_p99']:.3f}s, cpu {step['cpu']:.0%}, "
+                  f"limited by {step['limited_by']}")
+            if stop_on_collapse and step["limited_by"] != "none":
+                break
+        sustained = [s for s in steps if s["limited_by"] == "none"]
+        best = max(sustained, key=lambda s: s["offered_rps"], default=None)
+        collapsed = [s["limited_by"] for s in steps if s["limited_by"] != "none"]
+        report[route] = {
+            "capacity_rps": best["offered_rps"] if best else 0,
+            "capacity_sessions": best["mean_sessions"] if best else 0,
+            "capacity_peak_sessions": best["peak_sessions"] if best else 0,
+            "limited_by": collapsed[0] if collapsed else "not reached",
+            "steps": steps,
+        }
+    return report
+
+
+def format_report(report, settings):
+    output = []
+    output.append("# Chat backend capacity report")
+    output.append("")
+    output.append(f"Generated {datetime.now():%Y-%m-%d %H:%M} by `python loadtest.py` against "
+                  "`create_enhanced_workflow` with a `SqliteCheckpointer` and fake upstreams.")
+    output.append("")
+    output.append("Settings: " + ", ".join(f"{k}={v}" for k, v in settings.items()))
+    output.append("")
+    output.append(f"Each session runs {settings['turns']} turns on one thread, with an exponential think time "
+                  f"(mean {settings['think_time']}s) between turns. Later turns send only the new input and "
+                  "resume the conversation from the checkpointer. Sessions start on an open-loop schedule. "
+                  + ("The load tester has a thread for every session, so it never caps concurrency."
+                     if not settings["workers"] else
+                     f"The load tester is capped at {settings['workers']} concurrent sessions."))
+    output.append("")
+    output.append(f"A rate is sustained when every turn completes, the p99 wait for a load worker stays under 1s "
+                  f"and p99 turn latency is under {settings['slo']}s. Concurrent sessions is the mean number of "
+                  "open sessions (Little's law over the step) at the highest sustained rate.")
+    output.append("")
+    output.append("Worker queue is the wait for one of the load tester's threads. Upstream queue is the wait of "
+                  "call_upstream attempts for an in-flight slot and an upstream thread; Busy counts attempts that "
+                  "got no slot at all. Prefetch rejected counts search prefetches skipped because no slot was free. "
+                  "Checkpoint p99 is the time to commit one checkpoint or one task's writes, including the wait "
+                  "for the SQLite write lock. CPU is process CPU time over wall time. The limiting resource is "
+                  "taken from the first step that was not sustained.")
+    output.append("")
+    output.append("| Route | Sustained sessions/s | Concurrent sessions | Peak sessions | Limiting resource |")
+    output.append("|---|---|---|---|---|")
+    for route, data in report.items():
+        output.append(f"| {route} | {data['capacity_rps']:g} | {data['capacity_sessions']:.0f} "
+                      f"| {data['capacity_peak_sessions']} | {data['limited_by']} |")
+
+    for route, data in report.items():
+        output.append("")
+        output.append(f"## {route}")
+        output.append("")
+        output.append("| Sessions/s | Sessions | Concurrent | Peak | Turns done | Turns/s | Worker queue p99 "
+                      "| Upstream queue p50 | Upstream queue p99 | Busy | Prefetch rejected | Checkpoint p99 | CPU "
+                      "| p50 | p95 | p99 | p999 | Degraded | Errors | RSS growth MB | Limited by |")
+        output.append("|---|---|---|---|---|---|---|---|---|---|---|---|---|---|---|---|---|---|---|---|---|")
+        for s in data["steps"]:
+            output.append(
+                f"| {s['offered_rps']:g} | {s['sessions']} | {s['mean_sessions']:.0f} | {s['peak_sessions']} "
+                f"| {s['completed']}/{s['sent']} | {s['throughput_rps']:.2f} | {s['queue_p99']:.3f} "
+                f"| {s['upstream_wait_p50']:.3f} | {s['upstream_wait_p99']:.3f} | {s['upstream_busy']} "
+                f"| {s['prefetch_rejected']} | {s['checkpoint_p99']:.3f} | {s['cpu']:.0%} "
+                f"| {s['p50']:.3f} | {s['p95']:.3f} | {s['p99']:.3f} | {s['p999']:.3f} | {s['degraded']} "
+                f"| {s['errors']} | {s['rss_growth_mb']:.1f} | {s['limited_by']} |"
+            )
+    return "\n".join(output) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open-loop, multi-turn load test for the enhanced chat workflow")
+    parser.add_argument("--corpus", default="loadtest_corpus.jsonl", help="JSONL file with request_id, title and body")
+    parser.add_argument("--pattern", choices=["poisson", "ramp", "burst"], default="poisson")
+    parser.add_argument("--rates", default=",".join(map(str, DEFAULT_RATES)),
+                        help="Comma-separated rates of new sessions per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per rate step")
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURNS, help="Turns per session")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean seconds between a reply and the next turn")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Cap on concurrent sessions in the load tester; 0 gives every session a thread")
+    parser.add_argument("--upstream-in-flight", type=int, default=upstream.DEFAULT_MAX_IN_FLIGHT,
+                        help="Upstream calls allowed in flight at once (see upstream.configure)")
+    parser.add_argument("--slo", type=float, default=10.0, help="p99 turn latency target in seconds")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for fake upstream latencies")
+    parser.add_argument("--routes", default=",".join(ROUTES))
+    parser.add_argument("--db", help="SQLite file for the checkpointer (default: a fresh temporary file)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="capacity_report.md")
+    parser.add_argument("--json", help="Also write raw results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    install_fake_upstreams(args.time_scale)
+    upstream.configure(args.upstream_in_flight)
+    settings = {
+        "pattern": args.pattern,
+        "duration": args.duration,
+        "turns": args.turns,
+        "think_time": args.think_time,
+        "workers": args.workers,
+        "upstream_in_flight": args.upstream_in_flight,
+        "slo": args.slo,
+        "time_scale": args.time_scale,
+        "seed": args.seed,
+    }
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "sessions.db")
+    report = run_sweep(
+        load_corpus(args.corpus),
+        [float(r) for r in args.rates.split(",")],
+        args.duration,
+        args.pattern,
+        args.workers,
+        args.slo,
+        args.routes.split(","),
+        args.turns,
+        args.think_time,
+        db_path,
+    )
+
+    with open(args.output, "w") as f:
+        f.write(format_report(report, settings))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": settings, "routes": report}, f, indent=2)
+    print(f"Capacity report written to {args.output}")
@@ -1,15 +1,98 @@
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
 from langchain.schema import HumanMessage, AIMessage
 
-from search_tool import get_search_tool
+from search_tool import get_search_tool, search_results
+from upstream import (
+    call_upstream, submit_upstream, new_deadline, ensure_deadline, remaining_budget,
+    DeadlineExceeded, DEFAULT_REQUEST_BUDGET,
+)
 from langchain_groq import ChatGroq
 
-llm = ChatGroq(groq_api_key="******", model_name="compound-beta-mini")
+# Retries are handled by call_upstream, which also passes a per-request timeout
+llm = ChatGroq(groq_api_key="******", model_name="compound-beta-mini", max_retries=0)
 
 search_tool = get_search_tool()
 
-def classify_input(state):
+# Budget kept back from the search so the answer can still be generated
+ANSWER_RESERVE_SECONDS = 5.0
+
+FALLBACK_REPLY = "Sorry, I couldn't get an answer in time. Please try again in a moment."
+
+SEARCH_KEYWORDS = ["latest", "current", "2025", "now", "finance", "today", "research"]
+
+# Speculative searches started at graph entry, keyed by (session_id, user_input).
+# Each one is a single attempt running directly on the upstream pool.
+_search_prefetches = {}
+_search_prefetches_lock = threading.Lock()
+
+
+def invoke_llm(messages, timeout):
+    return llm.invoke(messages, timeout=timeout)
+
+
+def search(query, timeout):
+    return search_results(search_tool, query, timeout)
+
+
+def needs_web_search(user_input):
+    return any(kw in user_input.lower() for kw in SEARCH_KEYWORDS)
+
+
+def _prefetch_key(state):
+    return (state.get("session_id", ""), state["user_input"])
+
+
+def start_search_prefetch(state, deadline):
+    """Kick off the search for the current input before classification finishes"""
+    future = submit_upstream("search", search, state["user_input"], deadline=deadline - ANSWER_RESERVE_SECONDS)
+    if future is None:
+        return
+    with _search_prefetches_lock:
+        previous = _search_prefetches.pop(_prefetch_key(state), None)
+        _search_prefetches[_prefetch_key(state)] = future
+    if previous is not None:
+        previous.cancel()
+
+
+def take_search_prefetch(state):
+    with _search_prefetches_lock:
+        return _search_prefetches.pop(_prefetch_key(state), None)
+
+
+def discard_search_prefetch(state):
+    """Drop a speculative search when routing does not go through search_web_information"""
+    future = take_search_prefetch(state)
+    if future is not None:
+        future.cancel()
+
+
+def classify_input(state, skip_prefetch=None):
+    """Entry node. Graphs that route some inputs away from search can pass
+    skip_prefetch(user_input) to keep the speculative search from starting for them."""
     user_input = state["user_input"]
+    # classify_input is the entry node, so every turn gets a fresh budget even
+    # when a checkpointer restores the previous turn's deadline
+    deadline = new_deadline(state.get("request_budget") or DEFAULT_REQUEST_BUDGET)
+    needs_search = needs_web_search(user_input)
+    if needs_search and not (skip_prefetch and skip_prefetch(user_input)):
+        start_search_prefetch(state, deadline)
+    try:
+        conversation_type = _classify(user_input, deadline)
+    except BaseException:
+        discard_search_prefetch(state)
+        raise
+    return {
+        **state,
+        "deadline": deadline,
+        "conversation_type": conversation_type,
+        "needs_web_search": needs_search,
+        "search_queries": [user_input]
+    }
+
+
+def _classify(user_input, deadline):
     prompt = f"""
     Classify this user input into one of these categories:
     Input: "{user_input}"
@@ -20,14 +103,13 @@ def classify_input(state):
     - help: User needs help understanding something
     Respond with just the category.
     """
-    result = llm.invoke([HumanMessage(content=prompt)])
-    needs_search = any(kw in user_input.lower() for kw in ["latest", "current", "2025", "now", "finance", "today", "research"])
-    return {
-        **state,
-        "conversation_type": result.content.strip().lower(),
-        "needs_web_search": needs_search,
-        "search_queries": [user_input]
-    }
+    try:
+        result = call_upstream("llm", invoke_llm, [HumanMessage(content=prompt)], deadline=deadline)
+        conversation_type = result.content.strip().lower()
+    except Exception as e:
+        print(f"Classification failed, defaulting to chat: {e}")
+        conversation_type = "chat"
+    return conversation_type
 
 def classify_user_input(user_input):
     if any(word in user_input for word in ["hello", "hi", "hey"]):
@@ -37,17 +119,49 @@ def classify_user_input(user_input):
     return classification
 
 
-def search_web_information(state):
-    queries = state.get("search_queries", [])
+def _organic_results(res):
+    return res.get("organic_results") or []
+
+
+def run_search(queries, deadline):
     results = []
     for q in queries:
         try:
-            res = search_tool.results(q)
+            res = call_upstream("search", search, q, deadline=deadline)
             if res:
-                results.extend(res.get("organic_results"))
+                results.extend(_organic_results(res))
                 break
+        except DeadlineExceeded as e:
+            print(f"Search skipped: {e}")
+            break
         except Exception as e:
             print(f"Search failed: {e}")
+    return results
+
+
+def search_web_information(state):
+    queries = state.get("search_queries", [])
+    search_deadline = ensure_deadline(state) - ANSWER_RESERVE_SECONDS
+    prefetch = take_search_prefetch(state)
+    if prefetch is not None and queries == [state["user_input"]]:
+        try:
+            results = _organic_results(prefetch.result(timeout=max(0, remaining_budget(search_deadline))) or {})
+        except FuturesTimeoutError as e:
+            # On Python 3.11+ this is also the builtin TimeoutError a client raises when its own
+            # request times out, so only give up on search when the budget is really gone
+            if remaining_budget(search_deadline) <= 0:
+                prefetch.cancel()
+                results = []
+            else:
+                print(f"Search prefetch timed out: {e}")
+                results = run_search(queries, search_deadline)
+        except Exception as e:
+            print(f"Search prefetch failed: {e}")
+            results = run_search(queries, search_deadline)
+    else:
+        if prefetch is not None:
+            prefetch.cancel()
+        results = run_search(queries, search_deadline)
     return {
         **state,
         "search_results": results,
@@ -60,29 +174,48 @@ def generate_search_response(state):
     search_snippets = "\n".join(
         [f"{i+1}. {r.get('title')} - {r.get('link')}" for i, r in enumerate(state.get("search_results", []))]
     )
-    prompt = f"""
+    if search_snippets:
+        prompt = f"""
     Answer this query: "{query}"
 
     Use the following search results and in result provide link to website which are used for research
     {search_snippets}
     """
-    reply = llm.invoke([HumanMessage(content=prompt)])
+    else:
+        prompt = f"""
+    Answer this query: "{query}"
+
+    Web search is unavailable right now, so answer from your own knowledge and say that the answer may not be up to date.
+    """
+    try:
+        reply = call_upstream("llm", invoke_llm, [HumanMessage(content=prompt)], deadline=ensure_deadline(state))
+        content = reply.content
+    except Exception as e:
+        print(f"Search response failed: {e}")
+        content = FALLBACK_REPLY
     return {
         **state,
         "messages": state["messages"] + [
             HumanMessage(content=query),
-            AIMessage(content=reply.content)
+            AIMessage(content=content)
         ]
     }
 
 
 def handle_chat(state):
-    response = llm.invoke([HumanMessage(content=state["user_input"])])
+    discard_search_prefetch(state)
+    try:
+        response = call_upstream("llm", invoke_llm, [HumanMessage(content=state["user_input"])],
+                                 deadline=ensure_deadline(state))
+        content = response.content
+    except Exception as e:
+        print(f"Chat response failed: {e}")
+        content = FALLBACK_REPLY
     return {
         **state,
         "messages": state["messages"] + [
             HumanMessage(content=state["user_input"]),
-            AIMessage(content=response.content)
+            AIMessage(content=content)
         ]
     }
 
@@ -2,6 +2,7 @@ import os
 from typing import TypedDict, Annotated, List, Dict
 from langgraph.graph import StateGraph, START, END, add_messages
 from logic import classify_input, search_web_information, generate_search_response, handle_chat, route_conversation
+from checkpointer import SqliteCheckpointer, session_config
 
 class ConversationState(TypedDict):
     messages: Annotated[list, add_messages]
@@ -13,9 +14,11 @@ class ConversationState(TypedDict):
     search_results: List[Dict]
     search_queries: List[str]
     sources: List[str]
+    deadline: float  # epoch seconds, set by classify_input at the start of every turn
+    request_budget: float  # optional seconds allowed per turn; defaults to upstream.DEFAULT_REQUEST_BUDGET
 
 
-def create_workflow():
+def create_workflow(checkpointer=None):
     workflow = StateGraph(ConversationState)
     workflow.add_node("classify_input", classify_input)
     workflow.add_node("search_web_information", search_web_information)
@@ -31,11 +34,11 @@ def create_workflow():
     workflow.add_edge("generate_search_response", END)
     workflow.add_edge("handle_chat", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 
 if __name__ == "__main__":
-    wf = create_workflow()
+    wf = create_workflow(checkpointer=SqliteCheckpointer())
 
     initial_state = {
         "messages": [],
@@ -46,10 +49,11 @@ if __name__ == "__main__":
         "needs_web_search": True,
         "search_results": [],
         "search_queries": [],
-        "sources": []
+        "sources": [],
+        "deadline": 0.0
     }
 
-    result = wf.invoke(initial_state)
+    result = wf.invoke(initial_state, session_config(initial_state["session_id"]))
     print("💬 Response:\n")
     for msg in result["messages"]:
         print(msg.content)
@@ -0,0 +1,276 @@
+import html
+import json
+import re
+from dataclasses import is_dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, TextIO
+
+FORMATS = ("text", "markdown", "html", "json")
+
+# Months and actions per month shown in the human-readable formats
+MONTHS_SHOWN = 6
+ACTIONS_SHOWN = 2
+
+# Per-format section templates. Static fragments (titles, labels, rules) are
+# ready-made strings. Sections filled in for every plan are f-string functions;
+# risk, recommendation and alternative lines use str.format, since they are
+# rendered once per distinct value and cached.
+_TEMPLATES = {
+    "text": {
+        "header": "🎯 SMART FINANCIAL PLAN FOR YOUR BUSINESS GOAL\n" + "=" * 50,
+        "goal": lambda g: (
+            f"\n📋 GOAL: {g['description']}\n"
+            f"⏰ Timeline: {g['timeline_months']} months\n"
+            f"💰 Estimated Budget: ${g['estimated_budget']:,.2f}\n"
+            f"🏦 Current Savings: ${g['current_savings']:,.2f}\n"
+            f"📊 Additional Needed: ${g['additional_needed']:,.2f}"
+        ),
+        "capacity": lambda c: (
+            "\n💵 FINANCIAL CAPACITY\n"
+            f"Monthly Net Cash Flow: ${c['monthly_net_flow']:,.2f}\n"
+            f"Monthly Savings Target: ${c['monthly_savings_target']:,.2f}\n"
+            f"Time to Save: {c['months_needed_to_save']} months"
+        ),
+        "feasibility": lambda status, confidence_level: f"\n{status}\nConfidence Level: {confidence_level}",
+        "achievable": "✅ ACHIEVABLE",
+        "challenging": "⚠️ CHALLENGING",
+        "risks_header": "\n⚠️ RISK ASSESSMENT:",
+        "risk": "  • {}",
+        "risks_footer": "",
+        "monthly_header": "\n📅 MONTHLY SAVINGS PLAN\n" + "-" * 30,
+        "month": lambda m, milestone, action_list: (
+            f"Month {m['month']}: {milestone}\n"
+            f"  💰 Save: ${m['target_savings']:,.2f}\n"
+            f"  📈 Total: ${m['cumulative_savings']:,.2f}\n"
+            f"  🎯 Actions: {action_list}\n"
+        ),
+        "monthly_footer": "",
+        "recommendations_header": "💡 RECOMMENDATIONS:",
+        "recommendation": "  {}",
+        "recommendations_footer": "",
+        "alternatives_header": "\n🔄 ALTERNATIVE OPTIONS:",
+        "alternative": "  {option}: {description}\n    Budget Reduction: {budget_reduction}",
+        "alternatives_footer": "",
+        "separator": "\n",
+    },
+    "markdown": {
+        "header": "# 🎯 Smart Financial Plan for Your Business Goal",
+        "goal": lambda g: (
+            f"\n## 📋 Goal: {g['description']}\n\n"
+            f"- ⏰ **Timeline:** {g['timeline_months']} months\n"
+            f"- 💰 **Estimated Budget:** ${g['estimated_budget']:,.2f}\n"
+            f"- 🏦 **Current Savings:** ${g['current_savings']:,.2f}\n"
+            f"- 📊 **Additional Needed:** ${g['additional_needed']:,.2f}"
+        ),
+        "capacity": lambda c: (
+            "\n## 💵 Financial Capacity\n\n"
+            f"- **Monthly Net Cash Flow:** ${c['monthly_net_flow']:,.2f}\n"
+            f"- **Monthly Savings Target:** ${c['monthly_savings_target']:,.2f}\n"
+            f"- **Time to Save:** {c['months_needed_to_save']} months"
+        ),
+        "feasibility": lambda status, confidence_level: f"\n**{status}** (confidence: {confidence_level})",
+        "achievable": "✅ Achievable",
+        "challenging": "⚠️ Challenging",
+        "risks_header": "\n## ⚠️ Risk Assessment\n",
+        "risk": "- {}",
+        "risks_footer": "",
+        "monthly_header": (
+            "\n## 📅 Monthly Savings Plan\n\n"
+            "| Month | Milestone | 💰 Save | 📈 Total | 🎯 Actions |\n"
+            "|---|---|---|---|---|"
+        ),
+        "month": lambda m, milestone, action_list: (
+            f"| {m['month']} | {milestone} | ${m['target_savings']:,.2f} | ${m['cumulative_savings']:,.2f} | {action_list} |"
+        ),
+        "monthly_footer": "",
+        "recommendations_header": "\n## 💡 Recommendations\n",
+        "recommendation": "- {}",
+        "recommendations_footer": "",
+        "alternatives_header": "\n## 🔄 Alternative Options\n",
+        "alternative": "- **{option}:** {description} (budget reduction: {budget_reduction})",
+        "alternatives_footer": "",
+        "separator": "\n",
+    },
+    "html": {
+        "header": '<section class="financial-plan">\n<h2>🎯 Smart Financial Plan for Your Business Goal</h2>',
+        "goal": lambda g: (
+            f"<h3>📋 Goal: {g['description']}</h3>\n<ul>\n"
+            f"<li>⏰ Timeline: {g['timeline_months']} months</li>\n"
+            f"<li>💰 Estimated Budget: ${g['estimated_budget']:,.2f}</li>\n"
+            f"<li>🏦 Current Savings: ${g['current_savings']:,.2f}</li>\n"
+            f"<li>📊 Additional Needed: ${g['additional_needed']:,.2f}</li>\n</ul>"
+        ),
+        "capacity": lambda c: (
+            "<h3>💵 Financial Capacity</h3>\n<ul>\n"
+            f"<li>Monthly Net Cash Flow: ${c['monthly_net_flow']:,.2f}</li>\n"
+            f"<li>Monthly Savings Target: ${c['monthly_savings_target']:,.2f}</li>\n"
+            f"<li>Time to Save: {c['months_needed_to_save']} months</li>\n</ul>"
+        ),
+        "feasibility": lambda status, confidence_level: (
+            f'<p class="feasibility"><strong>{status}</strong> Confidence Level: {confidence_level}</p>'
+        ),
+        "achievable": "✅ ACHIEVABLE",
+        "challenging": "⚠️ CHALLENGING",
+        "risks_header": "<h3>⚠️ Risk Assessment</h3>\n<ul>",
+        "risk": "<li>{}</li>",
+        "risks_footer": "</ul>",
+        "monthly_header": (
+            "<h3>📅 Monthly Savings Plan</h3>\n<table>\n"
+            "<tr><th>Month</th><th>Milestone</th><th>💰 Save</th><th>📈 Total</th><th>🎯 Actions</th></tr>"
+        ),
+        "month": lambda m, milestone, action_list: (
+            f"<tr><td>{m['month']}</td><td>{milestone}</td><td>${m['target_savings']:,.2f}</td>"
+            f"<td>${m['cumulative_savings']:,.2f}</td><td>{action_list}</td></tr>"
+        ),
+        "monthly_footer": "</table>",
+        "recommendations_header": "<h3>💡 Recommendations</h3>\n<ul>",
+        "recommendation": "<li>{}</li>",
+        "recommendations_footer": "</ul>",
+        "alternatives_header": "<h3>🔄 Alternative Options</h3>\n<ul>",
+        "alternative": "<li><strong>{option}:</strong> {description} (Budget Reduction: {budget_reduction})</li>",
+        "alternatives_footer": "</ul>",
+        "footer": "</section>",
+        "separator": "\n",
+    },
+}
+
+# Characters with a meaning inside a Markdown line or table cell; < > & are
+# handled by html.escape since Markdown renderers pass raw HTML through
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]|~#])")
+
+
+def _escape_markdown(value: str) -> str:
+    # Newlines would let a value end its table row or heading and start new markup
+    value = " ".join(value.splitlines())
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", html.escape(value, quote=False))
+
+
+# User-supplied strings are escaped for the target format; no entry means values are inserted as-is
+_ESCAPE = {
+    "markdown": _escape_markdown,
+    "html": html.escape,
+}
+
+
+def _escaped(fmt: str, values: Dict) -> Dict:
+    escape = _ESCAPE.get(fmt)
+    if escape is None:
+        return values
+    return {key: escape(value) if isinstance(value, str) else value for key, value in values.items()}
+
+
+@lru_cache(maxsize=4096)
+def _render_item(fmt: str, key: str, value: str) -> str:
+    """Risks and recommendations come from a small fixed vocabulary, so cache them"""
+    escape = _ESCAPE.get(fmt)
+    return _TEMPLATES[fmt][key].format(escape(value) if escape else value)
+
+
+@lru_cache(maxsize=4096)
+def _render_alternative(fmt: str, option: str, description: str, budget_reduction: str) -> str:
+    return _TEMPLATES[fmt]["alternative"].format_map(_escaped(fmt, {
+        "option": option,
+        "description": description,
+        "budget_reduction": budget_reduction,
+    }))
+
+
+def _list_section(fmt: str, name: str, items: List[str]) -> str:
+    templates = _TEMPLATES[fmt]
+    parts = [templates[f"{name}_header"]] + items
+    if templates[f"{name}_footer"]:
+        parts.append(templates[f"{name}_footer"])
+    return templates["separator"].join(parts)
+
+
+def _monthly_section(fmt: str, monthly_plans: List) -> str:
+    templates = _TEMPLATES[fmt]
+    month = templates["month"]
+    escape = _ESCAPE.get(fmt)
+    rows = []
+    for monthly_plan in monthly_plans[:MONTHS_SHOWN]:
+        # MonthlyPlan dataclasses, or plain dicts once they have been through a serializer
+        values = getattr(monthly_plan, "__dict__", monthly_plan)
+        milestone = values["milestone"]
+        action_list = ", ".join(values["actions"][:ACTIONS_SHOWN])
+        if escape:
+            milestone, action_list = escape(milestone), escape(action_list)
+        rows.append(month(values, milestone, action_list))
+    return _list_section(fmt, "monthly", rows)
+
+
+def _template_sections(plan: Dict, fmt: str) -> Iterator[str]:
+    templates = _TEMPLATES[fmt]
+    yield templates["header"]
+    yield templates["goal"](_escaped(fmt, plan["goal_analysis"]))
+    yield templates["capacity"](_escaped(fmt, plan["financial_capacity"]))
+
+    feasibility = plan["feasibility"]
+    status = templates["achievable"] if feasibility["is_achievable"] else templates["challenging"]
+    confidence_level = feasibility["confidence_level"]
+    escape = _ESCAPE.get(fmt)
+    yield templates["feasibility"](status, escape(confidence_level) if escape else confidence_level)
+
+    if feasibility["risk_assessment"]:
+        yield _list_section(fmt, "risks", [_render_item(fmt, "risk", risk) for risk in feasibility["risk_assessment"]])
+
+    yield _monthly_section(fmt, plan["monthly_plan"])
+    yield _list_section(fmt, "recommendations", [
+        _render_item(fmt, "recommendation", rec) for rec in plan["recommendations"]
+    ])
+
+    if plan["alternatives"]:
+        yield _list_section(fmt, "alternatives", [
+            _render_alternative(fmt, alt["option"], alt["description"], alt["budget_reduction"])
+            for alt in plan["alternatives"]
+        ])
+
+    if "footer" in templates:
+        yield templates["footer"]
+
+
+def _json_default(value):
+    if is_dataclass(value):
+        return vars(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_sections(plan: Dict) -> Iterator[str]:
+    yield "{"
+    for i, (key, value) in enumerate(plan.items()):
+        prefix = ", " if i else ""
+        yield f"{prefix}{json.dumps(key)}: {json.dumps(value, default=_json_default, ensure_ascii=False)}"
+    yield "}"
+
+
+def stream_plan(plan: Dict, fmt: str = "text") -> Iterator[str]:
+    """Yield the rendered plan one section at a time, separators included"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'. Choose one of: {', '.join(FORMATS)}")
+    if fmt == "json":
+        yield from _json_sections(plan)
+        return
+
+    separator = _TEMPLATES[fmt]["separator"]
+    for i, section in enumerate(_template_sections(plan, fmt)):
+        yield separator + section if i else section
+
+
+def render_plan(plan: Dict, fmt: str = "text") -> str:
+    """Render a plan from FinancialAdvisor.create_financial_plan as text, markdown, html or json"""
+    if fmt in _TEMPLATES:
+        return _TEMPLATES[fmt]["separator"].join(_template_sections(plan, fmt))
+    return "".join(stream_plan(plan, fmt))
+
+
+def write_plan(plan: Dict, fp: TextIO, fmt: str = "text") -> None:
+    """Stream a rendered plan to a file-like object, writing each section as soon as it is ready"""
+    for section in stream_plan(plan, fmt):
+        fp.write(section)
+
+
+def render_plans(plans: List[Dict], fmt: str = "text") -> List[str]:
+    """Render a batch of plans in one format, checking the format once"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'. Choose one of: {', '.join(FORMATS)}")
+    return [render_plan(plan, fmt) for plan in plans]
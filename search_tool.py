@@ -6,3 +6,9 @@ def get_search_tool():
     if not api_key:
         raise EnvironmentError("SERPAPI_API_KEY not set in environment variables.")
     return SerpAPIWrapper(serpapi_api_key=api_key)
+
+def search_results(tool, query, timeout):
+    """Same as tool.results(query), but the HTTP request gives up after timeout seconds"""
+    search = tool.search_engine(tool.get_params(query))
+    search.timeout = timeout
+    return search.get_dict()
@@ -0,0 +1,223 @@
+import operator
+import threading
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langgraph.graph import END, StateGraph  # noqa: E402
+
+from checkpointer import SqliteCheckpointer, session_config  # noqa: E402
+
+
+class CounterState(TypedDict):
+    turns: Annotated[List[int], operator.add]
+    profile: str
+
+
+def build(checkpointer):
+    graph = StateGraph(CounterState)
+    graph.add_node("count", lambda state: {"turns": [len(state["turns"]) + 1]})
+    graph.set_entry_point("count")
+    graph.add_edge("count", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+class EchoState(TypedDict):
+    x: str
+    y: str
+
+
+def build_echo(checkpointer):
+    graph = StateGraph(EchoState)
+    graph.add_node("echo", lambda state: {"y": f"seen {state['x']}"})
+    graph.set_entry_point("echo")
+    graph.add_edge("echo", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def blob_rows(saver, channel):
+    return saver._connect().execute("SELECT COUNT(*) FROM blobs WHERE channel = ?", (channel,)).fetchone()[0]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def test_resume_from_another_instance(db_path):
+    build(SqliteCheckpointer(db_path)).invoke({"turns": [], "profile": "p"}, session_config("a"))
+
+    result = build(SqliteCheckpointer(db_path)).invoke({"turns": []}, session_config("a"))
+    assert result["turns"] == [1, 2]
+    assert result["profile"] == "p"
+
+
+def test_unchanged_channels_are_not_rewritten(db_path):
+    saver = SqliteCheckpointer(db_path)
+    workflow = build(saver)
+    workflow.invoke({"turns": [], "profile": "x" * 2000}, session_config("a"))
+    before = blob_rows(saver, "profile")
+    for _ in range(3):
+        workflow.invoke({"turns": []}, session_config("a"))
+    assert blob_rows(saver, "profile") == before
+    assert blob_rows(saver, "turns") > before
+
+
+def test_large_values_round_trip_compressed(db_path):
+    saver = SqliteCheckpointer(db_path)
+    build(saver).invoke({"turns": [], "profile": "x" * 2000}, session_config("a"))
+    types = [row[0] for row in saver._connect().execute("SELECT type FROM blobs WHERE channel = 'profile'")]
+    assert all(t.endswith("+zlib") for t in types)
+    assert saver.get_tuple(session_config("a")).checkpoint["channel_values"]["profile"] == "x" * 2000
+
+
+def test_pruning_keeps_latest_checkpoints_and_their_blobs(db_path):
+    saver = SqliteCheckpointer(db_path, keep_checkpoints=3)
+    workflow = build(saver)
+    workflow.invoke({"turns": [], "profile": "p"}, session_config("a"))
+    for _ in range(5):
+        workflow.invoke({"turns": []}, session_config("a"))
+
+    assert len(list(saver.list(session_config("a")))) == 3
+    # The profile blob was written on the first turn and is still used by every survivor
+    assert saver.get_tuple(session_config("a")).checkpoint["channel_values"]["profile"] == "p"
+    live = set()
+    for item in saver.list(session_config("a")):
+        live.update((c, str(v)) for c, v in item.checkpoint["channel_versions"].items())
+    stored = set(saver._connect().execute("SELECT channel, version FROM blobs").fetchall())
+    assert stored == live
+
+
+def test_resuming_from_an_older_checkpoint_keeps_the_fork_values(db_path):
+    saver = SqliteCheckpointer(db_path)
+    workflow = build_echo(saver)
+    workflow.invoke({"x": "t1"}, session_config("a"))
+    after_t1 = saver.get_tuple(session_config("a")).config
+    workflow.invoke({"x": "t2"}, session_config("a"))
+
+    workflow.invoke({"x": "fork"}, after_t1)
+    assert saver.get_tuple(session_config("a")).checkpoint["channel_values"] == {"x": "fork", "y": "seen fork"}
+
+
+def test_two_runs_from_the_same_checkpoint_keep_their_own_values(db_path):
+    # What two workers running turns on one session at the same time look like
+    saver = SqliteCheckpointer(db_path)
+    workflow = build_echo(saver)
+    workflow.invoke({"x": "t1"}, session_config("a"))
+    parent = saver.get_tuple(session_config("a")).config
+
+    results = {}
+    for value in ("left", "right"):
+        workflow.invoke({"x": value}, parent)
+        results[value] = saver.get_tuple(session_config("a")).config
+    for value, config in results.items():
+        assert saver.get_tuple(config).checkpoint["channel_values"] == {"x": value, "y": f"seen {value}"}
+
+
+def test_pruning_keeps_values_behind_reference_rows(db_path):
+    # A whole-state node bumps "profile" every turn; the value stays in the first turn's row
+    graph = StateGraph(CounterState)
+    graph.add_node("count", lambda state: {**state, "turns": [len(state["turns"]) + 1]})
+    graph.set_entry_point("count")
+    graph.add_edge("count", END)
+    saver = SqliteCheckpointer(db_path, keep_checkpoints=2)
+    workflow = graph.compile(checkpointer=saver)
+    workflow.invoke({"turns": [], "profile": "x" * 2000}, session_config("a"))
+    for _ in range(4):
+        workflow.invoke({"turns": []}, session_config("a"))
+
+    assert blob_rows(saver, "profile") > 1
+    for item in saver.list(session_config("a")):
+        assert item.checkpoint["channel_values"]["profile"] == "x" * 2000
+
+
+def test_put_writes_is_durable_and_visible_to_other_instances(db_path):
+    saver = SqliteCheckpointer(db_path)
+    build(saver).invoke({"turns": [], "profile": "p"}, session_config("a"))
+    config = saver.get_tuple(session_config("a")).config
+    saver.put_writes(config, [("turns", [9]), ("profile", "q")], task_id="task-1")
+
+    # No further put: a new process must still see the writes
+    pending = SqliteCheckpointer(db_path).get_tuple(config).pending_writes
+    assert pending == [("task-1", "turns", [9]), ("task-1", "profile", "q")]
+
+
+def test_concurrent_sessions_and_readers(db_path):
+    saver = SqliteCheckpointer(db_path)
+    workflow = build(saver)
+    errors = []
+
+    def converse(session):
+        try:
+            for _ in range(5):
+                workflow.invoke({"turns": [], "profile": session}, session_config(session))
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        reader = SqliteCheckpointer(db_path)
+        try:
+            for _ in range(50):
+                for session in ("s0", "s1", "s2", "s3"):
+                    item = reader.get_tuple(session_config(session))
+                    # The input checkpoint of a first turn only holds __start__
+                    if item is not None:
+                        assert item.checkpoint["channel_values"].get("profile", session) == session
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=converse, args=(f"s{i}",)) for i in range(4)]
+    threads += [threading.Thread(target=read) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    for i in range(4):
+        assert saver.get_tuple(session_config(f"s{i}")).checkpoint["channel_values"]["turns"] == [1, 2, 3, 4, 5]
+
+
+def test_delete_thread(db_path):
+    saver = SqliteCheckpointer(db_path)
+    build(saver).invoke({"turns": [], "profile": "p"}, session_config("a"))
+    saver.delete_thread("a")
+    assert saver.get_tuple(session_config("a")) is None
+
+
+def test_real_graph_stores_unchanged_channels_once(db_path, monkeypatch):
+    # Every node in the chat graph returns {**state, ...}, which bumps every channel's version
+    pytest.importorskip("langchain_groq")
+    pytest.importorskip("langchain_community")
+    from langchain.schema import AIMessage
+
+    import logic
+    from enhanced_main import create_enhanced_workflow
+
+    class ChatLLM:
+        def invoke(self, messages, timeout=None):
+            return AIMessage(content="chat")
+
+    monkeypatch.setattr(logic, "llm", ChatLLM())
+    saver = SqliteCheckpointer(db_path)
+    workflow = create_enhanced_workflow(checkpointer=saver)
+    profile = {"notes": "x" * 5000}
+    for turn in range(3):
+        result = workflow.invoke(
+            {"messages": [], "user_input": f"hello {turn}", "session_id": "a", "context": profile},
+            session_config("a"),
+        )
+
+    def value_rows(channel):
+        return saver._connect().execute(
+            "SELECT COUNT(*) FROM blobs WHERE channel = ? AND type != 'ref'", (channel,)
+        ).fetchone()[0]
+
+    assert value_rows("context") == 1
+    assert value_rows("session_id") == 1
+    # The empty history from the first input, then one new value per reply
+    assert value_rows("messages") == 4
+    assert len(result["messages"]) == 6
+    assert saver.get_tuple(session_config("a")).checkpoint["channel_values"]["context"] == profile
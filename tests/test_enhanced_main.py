@@ -0,0 +1,73 @@
+import pytest
+
+pytest.importorskip("langchain_groq")
+pytest.importorskip("langchain_community")
+
+from langchain.schema import AIMessage  # noqa: E402
+
+import logic  # noqa: E402
+from enhanced_main import create_enhanced_workflow, extract_financial_parameters, generate_financial_plan  # noqa: E402
+
+
+def state(**extra):
+    return {"messages": [], "user_input": "Expand to a second location", "session_id": "s", **extra}
+
+
+def test_output_format_defaults_to_text():
+    assert extract_financial_parameters(state())["financial_data"]["output_format"] == "text"
+
+
+def test_output_format_is_read_from_the_state():
+    extracted = extract_financial_parameters(state(output_format="html"))
+    assert extracted["financial_data"]["output_format"] == "html"
+    reply = generate_financial_plan(extracted)["messages"][-1]["content"]
+    assert reply.lstrip().startswith("<")
+
+
+def test_output_format_carries_over_from_the_previous_turn():
+    extracted = extract_financial_parameters(state(financial_data={"output_format": "markdown"}))
+    assert extracted["financial_data"]["output_format"] == "markdown"
+
+
+class ChatLLM:
+    def invoke(self, messages, timeout=None):
+        return AIMessage(content="chat")
+
+
+class CountingSearch:
+    def __init__(self):
+        self.queries = []
+
+    def get_params(self, query):
+        return {"q": query}
+
+    def search_engine(self, params):
+        search = self
+
+        class Request:
+            timeout = None
+
+            def get_dict(self):
+                search.queries.append(params["q"])
+                return {"organic_results": []}
+
+        return Request()
+
+
+def test_financial_inputs_do_not_start_a_search_prefetch(monkeypatch):
+    search = CountingSearch()
+    monkeypatch.setattr(logic, "llm", ChatLLM())
+    monkeypatch.setattr(logic, "search_tool", search)
+    # Matches both keyword lists; financial routing wins
+    result = create_enhanced_workflow().invoke(state(user_input="Latest funding options to expand my shop"))
+    assert result["is_financial_query"]
+    assert search.queries == []
+    assert not logic._search_prefetches
+
+
+def test_search_inputs_still_prefetch_in_the_enhanced_graph(monkeypatch):
+    search = CountingSearch()
+    monkeypatch.setattr(logic, "llm", ChatLLM())
+    monkeypatch.setattr(logic, "search_tool", search)
+    create_enhanced_workflow().invoke(state(user_input="latest news"))
+    assert search.queries == ["latest news"]
@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import pytest
+
+pytest.importorskip("langchain_groq")
+pytest.importorskip("langchain_community")
+
+from langchain.schema import AIMessage  # noqa: E402
+
+import logic  # noqa: E402
+
+
+class FakeLLM:
+    def __init__(self, latency=0.0, error=None):
+        self.latency = latency
+        self.error = error
+
+    def invoke(self, messages, timeout=None):
+        if self.error:
+            raise self.error
+        time.sleep(self.latency)
+        return AIMessage(content="research")
+
+
+class FakeSearch:
+    def __init__(self):
+        self.queries = []
+
+    def get_params(self, query):
+        return {"q": query}
+
+    def search_engine(self, params):
+        search = self
+
+        class Request:
+            timeout = None
+
+            def get_dict(self):
+                search.queries.append(params["q"])
+                return {"organic_results": [{"title": "t", "link": "https://example.com"}]}
+
+        return Request()
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    search = FakeSearch()
+    monkeypatch.setattr(logic, "llm", FakeLLM(latency=0.05))
+    monkeypatch.setattr(logic, "search_tool", search)
+    logic._search_prefetches.clear()
+    return search
+
+
+def state(user_input, session_id="s"):
+    return {"messages": [], "user_input": user_input, "session_id": session_id, "deadline": 0.0}
+
+
+def test_prefetch_is_joined_by_search_node(fakes):
+    classified = logic.classify_input(state("latest news"))
+    assert classified["needs_web_search"]
+    searched = logic.search_web_information(classified)
+    assert searched["sources"] == ["https://example.com"]
+    assert fakes.queries == ["latest news"]
+    assert not logic._search_prefetches
+
+
+def test_prefetch_discarded_on_chat_route(fakes):
+    classified = logic.classify_input(state("latest news"))
+    logic.handle_chat(classified)
+    assert not logic._search_prefetches
+
+
+def test_prefetch_removed_when_classification_raises(fakes, monkeypatch):
+    def interrupted(user_input, deadline):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(logic, "_classify", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        logic.classify_input(state("latest news"))
+    assert not logic._search_prefetches
+
+
+def test_classify_starts_a_fresh_deadline_every_turn(fakes):
+    stale = dict(state("hello"), deadline=time.time() - 60)
+    classified = logic.classify_input(stale)
+    assert classified["deadline"] > time.time()
+    reply = logic.handle_chat(classified)["messages"][-1].content
+    assert reply != logic.FALLBACK_REPLY
+
+
+def test_request_budget_sets_the_deadline(fakes):
+    classified = logic.classify_input(dict(state("hello"), request_budget=2))
+    assert classified["deadline"] - time.time() == pytest.approx(2, abs=0.5)
+
+
+def test_prefetch_client_timeout_is_retried_while_budget_is_left(fakes, monkeypatch):
+    classified = logic.classify_input(state("latest news"))
+    logic.take_search_prefetch(classified).result()
+
+    class TimedOut:
+        def result(self, timeout=None):
+            raise TimeoutError("request timed out after 12.0s")
+
+        def cancel(self):
+            pass
+
+    monkeypatch.setattr(logic, "take_search_prefetch", lambda state: TimedOut())
+    searched = logic.search_web_information(classified)
+    assert searched["sources"] == ["https://example.com"]
+    assert fakes.queries == ["latest news", "latest news"]
+
+
+def test_prefetch_dropped_when_the_budget_is_gone(fakes, monkeypatch):
+    classified = logic.classify_input(state("latest news"))
+    logic.take_search_prefetch(classified).result()
+
+    class Slow:
+        cancelled = False
+
+        def result(self, timeout=None):
+            time.sleep(timeout)
+            raise FuturesTimeoutError()
+
+        def cancel(self):
+            self.cancelled = True
+
+    slow = Slow()
+    monkeypatch.setattr(logic, "take_search_prefetch", lambda state: slow)
+    searched = logic.search_web_information(dict(classified, deadline=time.time() + logic.ANSWER_RESERVE_SECONDS + 0.1))
+    assert searched["search_results"] == []
+    assert slow.cancelled
@@ -0,0 +1,54 @@
+import io
+import json
+
+import pytest
+
+from financial_advisor import analyze_business_goal
+from plan_renderer import render_plan, render_plans, stream_plan, write_plan
+
+HOSTILE = "Buy equipment: <b>ovens</b> & **mixers** | [x](javascript:alert(1))\n| injected | row |"
+
+
+def plan(description="Buy new kitchen equipment"):
+    return analyze_business_goal(description, 12, 50000, 40000, 10000)[1]
+
+
+def test_stream_and_write_match_render():
+    for fmt in ("text", "markdown", "html", "json"):
+        rendered = render_plan(plan(), fmt)
+        assert "".join(stream_plan(plan(), fmt)) == rendered
+        out = io.StringIO()
+        write_plan(plan(), out, fmt)
+        assert out.getvalue() == rendered
+
+
+def test_render_plans_matches_render_plan():
+    plans = [plan(), plan("Hire two developers")]
+    assert render_plans(plans, "html") == [render_plan(p, "html") for p in plans]
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        render_plan(plan(), "pdf")
+    with pytest.raises(ValueError):
+        render_plans([plan()], "pdf")
+
+
+def test_markdown_escapes_html_and_markup():
+    rendered = render_plan(plan(HOSTILE), "markdown")
+    assert "<b>" not in rendered
+    assert "&lt;b&gt;ovens&lt;/b&gt; &amp; \\*\\*mixers\\*\\* \\| \\[x\\]" in rendered
+    # The newline must not start a new table row or paragraph
+    goal = next(line for line in rendered.splitlines() if line.startswith("## 📋 Goal:"))
+    assert "injected" in goal
+
+
+def test_html_escapes_user_fields():
+    rendered = render_plan(plan(HOSTILE), "html")
+    assert "<b>" not in rendered
+    assert "&lt;b&gt;ovens&lt;/b&gt; &amp;" in rendered
+
+
+def test_json_round_trips():
+    data = json.loads(render_plan(plan(HOSTILE), "json"))
+    assert data["goal_analysis"]["description"] == HOSTILE
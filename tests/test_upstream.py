@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+import upstream
+from upstream import DeadlineExceeded, call_upstream, new_deadline
+
+
+@pytest.fixture(autouse=True)
+def small_pool():
+    upstream.configure(4)
+    upstream._trackers.clear()
+    yield
+    upstream.configure()
+
+
+def client(latencies, calls=None):
+    """Fake client taking a timeout; each call uses the next latency and honours the timeout"""
+    latencies = list(latencies)
+    lock = threading.Lock()
+
+    def call(value, timeout):
+        with lock:
+            latency = latencies.pop(0) if latencies else 0
+            if calls is not None:
+                calls.append(timeout)
+        if isinstance(latency, Exception):
+            raise latency
+        if latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("client timeout")
+        time.sleep(latency)
+        return value
+
+    return call
+
+
+def test_retries_after_error():
+    calls = []
+    fn = client([ValueError("boom"), ValueError("boom"), 0], calls)
+    assert call_upstream("t", fn, 7, deadline=new_deadline(5)) == 7
+    assert len(calls) == 3
+
+
+def test_timeout_is_passed_to_client_and_retried():
+    calls = []
+    fn = client([5, 0], calls)
+    started = time.time()
+    assert call_upstream("t", fn, 1, deadline=new_deadline(5), attempt_timeout=0.2) == 1
+    assert time.time() - started < 1
+    assert calls[0] == pytest.approx(0.2, abs=0.05)
+
+
+def test_attempt_timeout_capped_by_remaining_budget():
+    calls = []
+    call_upstream("t", client([0], calls), 1, deadline=new_deadline(0.5), attempt_timeout=10)
+    assert calls[0] <= 0.5
+
+
+def test_deadline_exhausted():
+    fn = client([5, 5, 5])
+    started = time.time()
+    with pytest.raises(DeadlineExceeded):
+        call_upstream("t", fn, 1, deadline=new_deadline(0.5))
+    assert time.time() - started < 1
+
+
+def test_hedge_fires_after_p95():
+    for _ in range(upstream.MIN_HEDGE_SAMPLES):
+        upstream.get_tracker("h").record(0.05)
+    calls = []
+    fn = client([2, 0.01], calls)
+    started = time.time()
+    assert call_upstream("h", fn, 3, deadline=new_deadline(5)) == 3
+    assert time.time() - started < 0.5
+    assert len(calls) == 2
+
+
+def test_no_hedge_without_samples():
+    calls = []
+    call_upstream("h", client([0.2], calls), 3, deadline=new_deadline(5))
+    assert len(calls) == 1
+
+
+def test_hung_calls_are_bounded_and_do_not_starve_the_pool():
+    release = threading.Event()
+    running = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def hung(timeout):
+        # Ignores its timeout, like a client stuck in a connect
+        with lock:
+            running.append(1)
+            peak[0] = max(peak[0], len(running))
+        release.wait(10)
+        with lock:
+            running.pop()
+
+    threads = [
+        threading.Thread(target=lambda: pytest.raises(Exception, call_upstream, "hung", hung,
+                                                      deadline=new_deadline(0.3)))
+        for _ in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= upstream.max_in_flight
+
+    release.set()
+    time.sleep(0.1)
+    assert call_upstream("ok", client([0]), 5, deadline=new_deadline(1)) == 5
+
+
+def test_queue_stats_record_waits_and_rejections():
+    upstream.reset_queue_stats()
+    call_upstream("q", client([0]), 1, deadline=new_deadline(1))
+    release = threading.Event()
+    held = [upstream.submit_upstream("q", lambda timeout: release.wait(5), deadline=new_deadline(5))
+            for _ in range(upstream.max_in_flight + 1)]
+    release.set()
+
+    stats = upstream.queue_stats()
+    assert len(stats["q"]["waits"]) == 1 and stats["q"]["rejected"] == 0
+    assert held[-1] is None
+    assert stats["q prefetch"]["rejected"] == 1
+    assert len(stats["q prefetch"]["waits"]) <= upstream.max_in_flight
+
+
+def test_slot_wait_is_taken_out_of_the_client_timeout():
+    upstream.configure(1)
+    release = threading.Event()
+    holder = upstream.submit_upstream("s", lambda timeout: release.wait(1.0), deadline=new_deadline(5))
+    assert holder is not None
+
+    calls = []
+    started = time.time()
+    with pytest.raises(DeadlineExceeded):
+        call_upstream("s", client([5], calls), 1, deadline=new_deadline(1.5), attempts=1)
+    # The slot frees up at 1.0s, so the client only gets what is left of the 1.5s budget
+    assert calls and calls[0] <= 0.6
+    assert time.time() - started < 1.7
+    time.sleep(0.1)
+    assert upstream._slots.acquire(blocking=False)
+    upstream._slots.release()
+
+
+def test_no_client_call_when_no_slot_frees_up_within_the_budget():
+    upstream.configure(1)
+    upstream.submit_upstream("s", lambda timeout: time.sleep(0.5), deadline=new_deadline(5))
+    calls = []
+    with pytest.raises(DeadlineExceeded):
+        call_upstream("s", client([0], calls), 1, deadline=new_deadline(0.3), attempts=1)
+    assert calls == []
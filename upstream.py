@@ -0,0 +1,241 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Total time a single graph invocation may spend on upstream calls
+DEFAULT_REQUEST_BUDGET = 30.0
+# Upper bound for one attempt, even when more budget is left
+DEFAULT_ATTEMPT_TIMEOUT = 12.0
+DEFAULT_ATTEMPTS = 3
+BASE_BACKOFF = 0.2
+# Samples needed before hedged requests are fired
+MIN_HEDGE_SAMPLES = 20
+# Upstream calls (including abandoned attempts and hedges) allowed to run at once
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get("UPSTREAM_MAX_IN_FLIGHT", "64"))
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class UpstreamBusy(RuntimeError):
+    pass
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one upstream"""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self._samples) < MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+_queue_stats = {}
+_queue_lock = threading.Lock()
+
+_executor = None
+_slots = None
+_hedge_slots = None
+max_in_flight = 0
+
+
+def configure(limit=DEFAULT_MAX_IN_FLIGHT):
+    """Size the worker pool and the in-flight limit for upstream calls.
+
+    Every call holds a slot until the client call itself returns, so calls
+    abandoned by a timeout or a lost hedge still count against the limit.
+    At most an eighth of the slots can be used by hedges.
+    """
+    global _executor, _slots, _hedge_slots, max_in_flight
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    max_in_flight = limit
+    _executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix="upstream")
+    _slots = threading.BoundedSemaphore(limit)
+    _hedge_slots = threading.BoundedSemaphore(max(1, limit // 8))
+
+
+configure()
+
+
+def get_tracker(name):
+    with _trackers_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
+
+
+def _record_queue(queue, wait=None):
+    with _queue_lock:
+        stats = _queue_stats.setdefault(queue, {"waits": deque(maxlen=10000), "rejected": 0})
+        if wait is None:
+            stats["rejected"] += 1
+        else:
+            stats["waits"].append(wait)
+
+
+def queue_stats():
+    """Queueing delay per upstream queue: seconds each call waited for a slot and a worker, and rejections.
+
+    Queues are named "<upstream>" for call_upstream attempts, "<upstream> hedge"
+    and "<upstream> prefetch" for submit_upstream.
+    """
+    with _queue_lock:
+        return {queue: {"waits": list(stats["waits"]), "rejected": stats["rejected"]}
+                for queue, stats in _queue_stats.items()}
+
+
+def reset_queue_stats():
+    with _queue_lock:
+        _queue_stats.clear()
+
+
+def new_deadline(budget=DEFAULT_REQUEST_BUDGET):
+    return time.time() + budget
+
+
+def ensure_deadline(state, budget=DEFAULT_REQUEST_BUDGET):
+    """Return the request deadline from the state, starting one if it is unset"""
+    return state.get("deadline") or new_deadline(budget)
+
+
+def remaining_budget(deadline):
+    return deadline - time.time()
+
+
+def _timed(name, fn, args, kwargs, queue, queued_at):
+    started = time.time()
+    _record_queue(queue, started - queued_at)
+    result = fn(*args, **kwargs)
+    get_tracker(name).record(time.time() - started)
+    return result
+
+
+def _submit(name, fn, args, kwargs, attempt_deadline, wait_for_slot, hedge=False, queue=None):
+    """Start fn(*args, timeout=...) on the pool, or return None if no slot frees up in time.
+
+    The timeout is whatever is left until attempt_deadline once a slot is
+    acquired, so time spent waiting for the slot is not given to the client
+    again and an abandoned call releases its slot by attempt_deadline.
+    """
+    queue = queue or (f"{name} hedge" if hedge else name)
+    queued_at = time.time()
+    slots, hedge_slots = _slots, _hedge_slots
+    if hedge and not hedge_slots.acquire(blocking=False):
+        _record_queue(queue)
+        return None
+    acquired = slots.acquire(timeout=wait_for_slot) if wait_for_slot > 0 else slots.acquire(blocking=False)
+    if not acquired:
+        if hedge:
+            hedge_slots.release()
+        _record_queue(queue)
+        return None
+    timeout = attempt_deadline - time.time()
+    if timeout <= 0:
+        slots.release()
+        if hedge:
+            hedge_slots.release()
+        _record_queue(queue)
+        return None
+
+    def release(_):
+        slots.release()
+        if hedge:
+            hedge_slots.release()
+
+    future = _executor.submit(_timed, name, fn, args, {**kwargs, "timeout": timeout}, queue, queued_at)
+    future.add_done_callback(release)
+    return future
+
+
+def submit_upstream(name, fn, *args, deadline, attempt_timeout=DEFAULT_ATTEMPT_TIMEOUT, **kwargs):
+    """Start one attempt of fn without waiting for it.
+
+    Returns a future for the result, or None when no slot is free or the
+    budget is already spent. There are no retries or hedges; callers fall
+    back to call_upstream if the future fails.
+    """
+    timeout = min(attempt_timeout, remaining_budget(deadline))
+    if timeout <= 0:
+        return None
+    return _submit(name, fn, args, kwargs, time.time() + timeout, wait_for_slot=0, queue=f"{name} prefetch")
+
+
+def call_upstream(name, fn, *args, deadline, attempts=DEFAULT_ATTEMPTS,
+                  attempt_timeout=DEFAULT_ATTEMPT_TIMEOUT, hedge=True, **kwargs):
+    """Call fn(*args, timeout=..., **kwargs) within the request deadline.
+
+    fn must accept a timeout in seconds and pass it to its client so the
+    underlying request really ends; each attempt gets the smaller of
+    attempt_timeout and the remaining budget, less any time spent waiting
+    for an in-flight slot. Failed attempts are retried
+    with jittered exponential backoff. When hedge is set and an attempt is
+    still running after the upstream's p95 latency, a second identical request
+    is fired if a hedge slot is free, and the first one to succeed wins.
+    Raises DeadlineExceeded once the budget is spent, or the last error.
+    """
+    tracker = get_tracker(name)
+    last_error = None
+
+    for attempt in range(attempts):
+        remaining = remaining_budget(deadline)
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{name}: request budget exhausted") from last_error
+        timeout = min(attempt_timeout, remaining)
+        attempt_deadline = time.time() + timeout
+
+        future = _submit(name, fn, args, kwargs, attempt_deadline,
+                         wait_for_slot=min(timeout, remaining_budget(deadline)))
+        pending = {future} if future is not None else set()
+        if not pending:
+            last_error = UpstreamBusy(f"{name}: no free upstream slot for {timeout:.1f}s")
+
+        hedge_delay = tracker.p95() if hedge and pending else None
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(pending, timeout=min(hedge_delay, max(0, attempt_deadline - time.time())))
+            if not done:
+                hedged = _submit(name, fn, args, kwargs, attempt_deadline, wait_for_slot=0, hedge=True)
+                if hedged is not None:
+                    pending.add(hedged)
+
+        while pending:
+            done, pending = wait(pending, timeout=max(0, attempt_deadline - time.time()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                last_error = TimeoutError(f"{name}: attempt {attempt + 1} timed out after {timeout:.1f}s")
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                for other in pending:
+                    other.cancel()
+                return result
+
+        print(f"{name} attempt {attempt + 1} failed: {last_error}")
+        if attempt + 1 < attempts:
+            backoff = random.uniform(0, BASE_BACKOFF * (2 ** attempt))
+            time.sleep(max(0, min(backoff, remaining_budget(deadline))))
+
+    if remaining_budget(deadline) <= 0:
+        raise DeadlineExceeded(f"{name}: request budget exhausted") from last_error
+    raise last_error